@@ -1,20 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import os
-import json
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import LabelEncoder
+import glob
+import time
+import threading
+import itertools
+import uuid
+import orjson
 import numpy as np
-from openpyxl import Workbook
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+import pyarrow.dataset as ds
 import io
-import base64
 
 # Page configuration
 st.set_page_config(
@@ -57,100 +54,379 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+EXPENSE_COLUMNS = ['date', 'category', 'amount', 'description']
+# The date keys fit small ints, which cuts the bytes scanned by every month filter.
+# Amounts stay float64: float32's ~7 significant digits visibly distort rupee values
+EXPENSE_DTYPES = {'category': 'category', 'amount': 'float64', '_y': 'int16', '_m': 'int8', '_ym': 'int32'}
+# Buffered expenses are folded into the dataframe once this many accumulate
+FLUSH_THRESHOLD = 64
+# The dataset is compacted into one base file once it has more files than this
+MAX_PARTS = 64
+# Orders parts written within one clock tick; the uuid keeps other processes apart
+_part_sequence = itertools.count()
+
+def _empty_expenses():
+    """Create an empty expenses dataframe with the loaded dtypes"""
+    return pd.DataFrame({
+        'date': pd.Series(dtype='datetime64[ns]'),
+        'category': pd.Series(dtype=EXPENSE_DTYPES['category']),
+        'amount': pd.Series(dtype=EXPENSE_DTYPES['amount']),
+        'description': pd.Series(dtype=object),
+        '_y': pd.Series(dtype=EXPENSE_DTYPES['_y']),
+        '_m': pd.Series(dtype=EXPENSE_DTYPES['_m']),
+        '_ym': pd.Series(dtype=EXPENSE_DTYPES['_ym'])
+    })
+
+def _add_date_keys(expenses_df):
+    """Add integer year, month and year*12+month columns for fast filtering"""
+    expenses_df['_y'] = expenses_df['date'].dt.year.astype(EXPENSE_DTYPES['_y'])
+    expenses_df['_m'] = expenses_df['date'].dt.month.astype(EXPENSE_DTYPES['_m'])
+    expenses_df['_ym'] = (expenses_df['_y'].astype(np.int32) * 12 + expenses_df['_m']).astype(EXPENSE_DTYPES['_ym'])
+    return expenses_df
+
+def _run_sums(keys, amounts):
+    """Sum amounts over each run of equal keys in one np.add.reduceat pass"""
+    if keys.size == 0:
+        return pd.Series(dtype=np.float64)
+    # Skip missing amounts like pandas' sum() does instead of poisoning the month
+    amounts = np.where(np.isfinite(amounts), amounts, 0.0)
+    edges = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return pd.Series(np.add.reduceat(amounts, edges), index=keys[edges])
+
+def _category_totals(expenses_df, rows=None):
+    """Get per-category totals in one np.bincount pass over the category codes"""
+    categories = expenses_df['category'].cat.categories
+    codes = expenses_df['category'].cat.codes.to_numpy()
+    amounts = expenses_df['amount'].to_numpy(dtype=np.float64)
+    if rows is not None:
+        codes, amounts = codes[rows], amounts[rows]
+    # Missing categories have code -1, which bincount rejects
+    valid = codes >= 0
+    codes, amounts = codes[valid], amounts[valid]
+    # Skip missing amounts like pandas' sum() does
+    amounts = np.where(np.isfinite(amounts), amounts, 0.0)
+    counts = np.bincount(codes, minlength=len(categories))
+    sums = np.bincount(codes, weights=amounts, minlength=len(categories))
+    # Only report categories that actually occur
+    return pd.Series(sums, index=categories)[counts > 0]
+
+def _monthly_totals(expenses_df, rows=None):
+    """Get totals per _ym month key with one np.add.reduceat over the sorted keys"""
+    ym = expenses_df['_ym'].to_numpy()
+    amounts = expenses_df['amount'].to_numpy(dtype=np.float64)
+    if rows is not None:
+        ym, amounts = ym[rows], amounts[rows]
+    # Rows are sorted by date, so every month is one contiguous run
+    return _run_sums(ym, amounts)
+
+def _insights_pass(amounts, ym, small_limit=100):
+    """Get the small-expense count and total plus monthly totals in a few vectorized passes"""
+    # NaN compares False, so missing amounts never count as small
+    small = amounts < small_limit
+    small_count = int(np.count_nonzero(small))
+    small_total = float(amounts[small].sum())
+    return small_count, small_total, _run_sums(ym, amounts)
+
+def dashboard_metrics(monthly_data, category_totals):
+    """Get total, active-day count, transaction count and top category for a month"""
+    amounts = monthly_data['amount'].to_numpy(dtype=np.float64)
+    days = monthly_data['date'].dt.day.to_numpy(dtype=np.int8)
+    # Skip missing amounts like pandas' sum() does
+    total = np.nansum(amounts)
+    num_days = np.count_nonzero(np.bincount(days, minlength=32))
+    # category_totals only lists categories that occur, so it is empty when none do
+    top_category = category_totals.idxmax() if not category_totals.empty else "—"
+    return total, num_days, amounts.size, top_category
+
+def _write_sheet(workbook, name, data):
+    """Stream a dataframe into a new worksheet one row at a time"""
+    worksheet = workbook.add_worksheet(name)
+    worksheet.write_row(0, 0, data.columns.tolist())
+    for row_num, row in enumerate(data.itertuples(index=False), start=1):
+        # xlsxwriter rejects NaN; None leaves the cell blank like to_excel did
+        worksheet.write_row(row_num, 0, [None if pd.isna(value) else value for value in row])
+
+def _read_expenses_csv(path):
+    """Read a legacy expenses CSV"""
+    expenses_df = pd.read_csv(
+        path,
+        parse_dates=['date'],
+        dtype={'category': EXPENSE_DTYPES['category'], 'amount': EXPENSE_DTYPES['amount']}
+    )
+    # Handle different date formats more flexibly
+    if not pd.api.types.is_datetime64_any_dtype(expenses_df['date']):
+        expenses_df['date'] = pd.to_datetime(expenses_df['date'], errors='coerce')
+    # Remove any rows with invalid dates
+    return expenses_df.dropna(subset=['date'])
+
+def _file_stamp(path):
+    """Get the write-order stamp of a dataset file (the name after 'part-'/'base-')"""
+    return os.path.basename(path).split('-', 1)[1]
+
+def _dataset_files(path):
+    """List the live files of the expenses dataset in write order"""
+    # Files are ordered by the stamp in their name, not by when they were published,
+    # so the dataset supports a single writing process only
+    parts = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+    bases = sorted(glob.glob(os.path.join(path, 'base-*.parquet')))
+    if not bases:
+        return parts
+    # The newest base already holds every part up to and including its stamp,
+    # so parts left behind by an interrupted compaction are never read twice
+    base = bases[-1]
+    return [base] + [part for part in parts if _file_stamp(part) > _file_stamp(base)]
+
+def _read_dataset_files(files):
+    """Read dataset files into one raw dataframe with a single dataset scan"""
+    return ds.dataset(files, format='parquet').to_table().to_pandas()
+
+@st.cache_data
+def _load_expenses(path, mtime):
+    """Read the expenses dataset; `mtime` only keys the cache so edits invalidate it"""
+    expenses_df = _read_dataset_files(_dataset_files(path))
+    # Parts store categories as plain strings
+    expenses_df = expenses_df.astype({
+        'category': EXPENSE_DTYPES['category'],
+        'amount': EXPENSE_DTYPES['amount']
+    })
+    expenses_df = expenses_df.sort_values('date', kind='stable', ignore_index=True)
+    return _add_date_keys(expenses_df)
+
+@st.cache_data
+def _load_budgets(path, mtime):
+    """Read the budgets JSON; `mtime` only keys the cache so edits invalidate it"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
 class ExpenseTracker:
     def __init__(self):
-        self.data_file = "expenses.csv"
+        # Parquet dataset: a directory of part files, one appended per new expense
+        self.data_file = "expenses.parquet"
+        self.legacy_data_file = "expenses.csv"
         self.budget_file = "budgets.json"
+        # New expenses are buffered here and concatenated lazily on read
+        self._pending_rows = []
+        # The tracker is shared by every session, so guard mutations
+        self._lock = threading.RLock()
+        # Derived results keyed on (data version, ...); any mutation bumps the version
+        self._version = 0
+        self._cache = {}
+        # Files in the dataset directory, so adds can trigger compaction without a glob
+        self._file_count = 0
         self.load_data()
     
+    @property
+    def expenses_df(self):
+        """All expenses, including any still buffered"""
+        with self._lock:
+            self._flush()
+            return self._expenses_df
+    
     def load_data(self):
         """Load expenses and budget data from files"""
-        # Load expenses
-        if os.path.exists(self.data_file):
-            self.expenses_df = pd.read_csv(self.data_file)
-            # Handle different date formats more flexibly
-            self.expenses_df['date'] = pd.to_datetime(self.expenses_df['date'], errors='coerce')
-            # Remove any rows with invalid dates
-            self.expenses_df = self.expenses_df.dropna(subset=['date'])
-        else:
-            self.expenses_df = pd.DataFrame(columns=['date', 'category', 'amount', 'description'])
-        
-        # Load budgets
-        if os.path.exists(self.budget_file):
-            with open(self.budget_file, 'r') as f:
-                self.budgets = json.load(f)
-        else:
-            self.budgets = {}
-    
-    def save_data(self):
-        """Save expenses and budget data to files"""
-        self.expenses_df.to_csv(self.data_file, index=False)
-        with open(self.budget_file, 'w') as f:
-            json.dump(self.budgets, f)
+        with self._lock:
+            # Migrate the old CSV storage once
+            if not os.path.exists(self.data_file) and os.path.exists(self.legacy_data_file):
+                self._write_part(_read_expenses_csv(self.legacy_data_file))
+            
+            # Load expenses
+            self._invalidate()
+            self._pending_rows.clear()
+            files = _dataset_files(self.data_file)
+            self._file_count = len(files)
+            if files:
+                self._expenses_df = _load_expenses(self.data_file, os.path.getmtime(self.data_file))
+            else:
+                self._expenses_df = _empty_expenses()
+            self._index_dates()
+            if self._file_count > MAX_PARTS:
+                self.save_expenses()
+            
+            # Load budgets
+            if os.path.exists(self.budget_file):
+                self.budgets = _load_budgets(self.budget_file, os.path.getmtime(self.budget_file))
+            else:
+                self.budgets = {}
+    
+    def _write_part(self, expenses_df):
+        """Write expenses as a new part file of the dataset"""
+        # time_ns() stays 19 digits until 2286, so names sort in write order
+        name = f"part-{time.time_ns()}-{next(_part_sequence):08d}-{uuid.uuid4().hex}.parquet"
+        self._write_file(expenses_df, name)
+        self._file_count += 1
+    
+    def _write_file(self, expenses_df, name):
+        """Atomically write expenses to a file of the dataset"""
+        os.makedirs(self.data_file, exist_ok=True)
+        # The temp name matches neither the part- nor the base- glob, so it is never read
+        tmp_path = os.path.join(self.data_file, f".{name}.tmp")
+        part = expenses_df[EXPENSE_COLUMNS].astype({
+            'date': 'datetime64[ns]',
+            # Plain objects rather than str, so missing categories stay null
+            'category': object,
+            'amount': EXPENSE_DTYPES['amount']
+        })
+        part.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, os.path.join(self.data_file, name))
+        _load_expenses.clear()
+    
+    def _invalidate(self):
+        """Bump the data version and drop cached results"""
+        with self._lock:
+            self._version += 1
+            self._cache.clear()
+    
+    def _memoized(self, key, compute):
+        """Return compute() cached under key for the current data version"""
+        with self._lock:
+            key = (self._version,) + key
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+    
+    def _index_dates(self):
+        """Cache the sorted dates as int64 nanoseconds for searchsorted"""
+        self._dates_ns = self._expenses_df['date'].to_numpy(dtype='datetime64[ns]').view('i8')
+    
+    def _flush(self):
+        """Concatenate buffered expenses onto the dataframe in one go"""
+        with self._lock:
+            if not self._pending_rows:
+                return
+            # Match the loaded dtypes so the concat doesn't upcast the date keys to int64
+            new_expenses = pd.DataFrame.from_records(self._pending_rows).astype(EXPENSE_DTYPES)
+            expenses_df = pd.concat([self._expenses_df, new_expenses], ignore_index=True)
+            # Categoricals with different categories concatenate to object
+            expenses_df['category'] = expenses_df['category'].astype(EXPENSE_DTYPES['category'])
+            # Keep the frame sorted by date; the stable sort is cheap on nearly sorted data
+            self._expenses_df = expenses_df.sort_values('date', kind='stable', ignore_index=True)
+            self._index_dates()
+            self._pending_rows.clear()
+    
+    def save_expenses(self):
+        """Save expenses, compacting the dataset into a single base file"""
+        with self._lock:
+            files = _dataset_files(self.data_file)
+            if len(files) < 2:
+                return
+            # The base is published by one atomic rename and supersedes every file
+            # up to its stamp; deleting those afterwards is only cleanup
+            stamp = _file_stamp(files[-1])
+            base_name = f"base-{stamp}"
+            self._write_file(_read_dataset_files(files), base_name)
+            for pattern in ('part-*.parquet', 'base-*.parquet'):
+                for path in glob.glob(os.path.join(self.data_file, pattern)):
+                    if _file_stamp(path) <= stamp and os.path.basename(path) != base_name:
+                        os.remove(path)
+            self._file_count = 1
+    
+    def save_budgets(self):
+        """Atomically save budget data"""
+        with self._lock:
+            tmp_file = self.budget_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(self.budgets))
+            os.replace(tmp_file, self.budget_file)
+            _load_budgets.clear()
     
     def add_expense(self, date, category, amount, description):
         """Add a new expense"""
-        # Convert date to string format for consistency
-        if hasattr(date, 'strftime'):
-            date_str = date.strftime('%Y-%m-%d')
-        else:
-            date_str = str(date)
-            
-        new_expense = pd.DataFrame({
-            'date': [date_str],
-            'category': [category],
-            'amount': [amount],
-            'description': [description]
-        })
-        self.expenses_df = pd.concat([self.expenses_df, new_expense], ignore_index=True)
-        self.save_data()
+        expense_date = pd.Timestamp(date)
+        new_expense = {
+            'date': expense_date,
+            'category': category,
+            'amount': amount,
+            'description': description,
+            '_y': expense_date.year,
+            '_m': expense_date.month,
+            '_ym': expense_date.year * 12 + expense_date.month
+        }
+        with self._lock:
+            self._invalidate()
+            self._pending_rows.append(new_expense)
+            # Only the new row hits the disk
+            self._write_part(pd.DataFrame.from_records([new_expense]))
+            if len(self._pending_rows) >= FLUSH_THRESHOLD:
+                self._flush()
+            # Long-running servers rarely reload, so keep the part count bounded here
+            if self._file_count > MAX_PARTS:
+                self.save_expenses()
+    
+    def set_budget(self, category, amount):
+        """Set the monthly budget for a category"""
+        with self._lock:
+            self._invalidate()
+            # Swap in a new dict so other sessions iterating the old one aren't disturbed
+            self.budgets = {**self.budgets, category: amount}
+            self.save_budgets()
     
     def get_categories(self):
         """Get unique categories from expenses"""
         return sorted(self.expenses_df['category'].unique().tolist()) if not self.expenses_df.empty else []
     
+    def range_slice(self, start, end):
+        """Get expenses dated from start to end, both inclusive"""
+        # Bounds and frame come from one locked snapshot; a flush swaps in a new frame
+        # rather than mutating this one, so the returned slice stays consistent
+        with self._lock:
+            expenses_df = self.expenses_df
+            lo = np.searchsorted(self._dates_ns, np.datetime64(start, 'ns').astype(np.int64))
+            hi = np.searchsorted(self._dates_ns, np.datetime64(end + timedelta(days=1), 'ns').astype(np.int64))
+            return expenses_df.iloc[lo:hi]
+    
+    def cat_totals(self, mask=None):
+        """Get per-category totals, optionally over a row mask or slice"""
+        return _category_totals(self.expenses_df, mask)
+    
+    def monthly_totals(self, rows=None):
+        """Get totals per _ym month key, optionally over a row mask or slice"""
+        return _monthly_totals(self.expenses_df, rows)
+    
     def get_monthly_summary(self, year, month):
         """Get monthly expense summary"""
-        monthly_data = self.expenses_df[
-            (self.expenses_df['date'].dt.year == year) & 
-            (self.expenses_df['date'].dt.month == month)
-        ]
-        return monthly_data
+        def compute():
+            return self.expenses_df[self.expenses_df['_ym'] == year * 12 + month]
+        return self._memoized(('monthly', year, month), compute)
+    
+    def cat_totals_for_month(self, year, month):
+        """Get per-category totals for a month as a Series indexed by category"""
+        def compute():
+            return self.cat_totals(self.expenses_df['_ym'].to_numpy() == year * 12 + month)
+        return self._memoized(('cat_totals', year, month), compute)
     
     def get_category_totals(self, year, month):
         """Get category-wise totals for a month"""
-        monthly_data = self.get_monthly_summary(year, month)
-        if monthly_data.empty:
-            return pd.DataFrame()
-        return monthly_data.groupby('category')['amount'].sum().reset_index()
+        def compute():
+            totals = self.cat_totals_for_month(year, month)
+            if totals.empty:
+                return pd.DataFrame()
+            return totals.rename_axis('category').reset_index(name='amount')
+        return self._memoized(('category_totals', year, month), compute)
     
     def predict_next_month(self):
-        """Predict next month's spending using Linear Regression"""
+        """Predict next month's spending using least-squares linear regression"""
         if len(self.expenses_df) < 3:
             return None, "Not enough data for prediction"
         
         # Prepare data for ML model
-        self.expenses_df['year'] = self.expenses_df['date'].dt.year
-        self.expenses_df['month'] = self.expenses_df['date'].dt.month
-        monthly_totals = self.expenses_df.groupby(['year', 'month'])['amount'].sum().reset_index()
-        monthly_totals['month_num'] = monthly_totals['year'] * 12 + monthly_totals['month']
+        monthly_totals = self.monthly_totals()
         
         if len(monthly_totals) < 3:
             return None, "Not enough monthly data for prediction"
         
-        # Train model
-        X = monthly_totals[['month_num']].values
-        y = monthly_totals['amount'].values
-        
-        model = LinearRegression()
-        model.fit(X, y)
+        # Fit the trend line in closed form
+        x = monthly_totals.index.to_numpy(dtype=np.float64)
+        y = monthly_totals.to_numpy(dtype=np.float64)
+        x_mean, y_mean = x.mean(), y.mean()
+        slope = ((x - x_mean) * (y - y_mean)).sum() / ((x - x_mean) ** 2).sum()
+        intercept = y_mean - slope * x_mean
         
         # Predict next month
         current_year = datetime.now().year
         current_month = datetime.now().month
         next_month_num = current_year * 12 + current_month + 1
         
-        prediction = model.predict([[next_month_num]])[0]
+        prediction = slope * next_month_num + intercept
         
         return max(0, prediction), "Prediction based on historical data"
     
@@ -180,9 +456,14 @@ class ExpenseTracker:
         
         return alerts
 
+@st.cache_resource
+def get_tracker():
+    """Create the tracker once and reuse it across reruns and sessions"""
+    return ExpenseTracker()
+
 def main():
     # Initialize tracker
-    tracker = ExpenseTracker()
+    tracker = get_tracker()
     
     # Main header
     st.markdown('<h1 class="main-header">💰 Smart Expense Tracker</h1>', unsafe_allow_html=True)
@@ -213,6 +494,7 @@ def show_dashboard(tracker):
     
     # Refresh button
     if st.button("🔄 Refresh Data", type="secondary"):
+        tracker.load_data()
         st.rerun()
     
     # Date selection
@@ -236,22 +518,23 @@ def show_dashboard(tracker):
         return
     
     # Key metrics
+    total_spent, num_days, num_transactions, top_category = dashboard_metrics(
+        monthly_data,
+        tracker.cat_totals_for_month(selected_year, selected_month)
+    )
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_spent = monthly_data['amount'].sum()
         st.metric("Total Spent", f"₹{total_spent:,.2f}")
     
     with col2:
-        avg_daily = total_spent / len(monthly_data['date'].dt.day.unique())
+        avg_daily = total_spent / num_days
         st.metric("Avg Daily", f"₹{avg_daily:,.2f}")
     
     with col3:
-        num_transactions = len(monthly_data)
         st.metric("Transactions", num_transactions)
     
     with col4:
-        top_category = monthly_data.groupby('category')['amount'].sum().idxmax()
         st.metric("Top Category", top_category)
     
     # Budget alerts
@@ -283,8 +566,9 @@ def show_dashboard(tracker):
     # Recent transactions
     st.subheader("Recent Transactions")
     recent_expenses = monthly_data.sort_values('date', ascending=False).head(10)
-    st.dataframe(recent_expenses, use_container_width=True)
+    st.dataframe(recent_expenses[EXPENSE_COLUMNS], use_container_width=True)
 
+@st.fragment
 def show_add_expense(tracker):
     """Show add expense form"""
     st.header("➕ Add New Expense")
@@ -309,7 +593,6 @@ def show_add_expense(tracker):
             if amount > 0 and description:
                 tracker.add_expense(expense_date, category, amount, description)
                 st.success("✅ Expense added successfully!")
-                st.rerun()
             else:
                 st.error("Please fill in all fields with valid values.")
 
@@ -329,10 +612,7 @@ def show_analytics(tracker):
         end_date = st.date_input("End Date", value=tracker.expenses_df['date'].max().date())
     
     # Filter data
-    filtered_data = tracker.expenses_df[
-        (tracker.expenses_df['date'].dt.date >= start_date) & 
-        (tracker.expenses_df['date'].dt.date <= end_date)
-    ]
+    filtered_data = tracker.range_slice(start_date, end_date)
     
     if filtered_data.empty:
         st.warning("No data available for the selected period.")
@@ -342,10 +622,13 @@ def show_analytics(tracker):
     st.subheader("Spending Trends")
     
     # Monthly spending
-    filtered_data['year'] = filtered_data['date'].dt.year
-    filtered_data['month'] = filtered_data['date'].dt.month
-    monthly_spending = filtered_data.groupby(['year', 'month'])['amount'].sum().reset_index()
-    monthly_spending['month_year'] = monthly_spending['year'].astype(str) + '-' + monthly_spending['month'].astype(str)
+    monthly_totals = _monthly_totals(filtered_data)
+    # _ym is year * 12 + month with month in 1..12
+    years, months = np.divmod(monthly_totals.index.to_numpy() - 1, 12)
+    monthly_spending = pd.DataFrame({
+        'month_year': [f"{y}-{m + 1:02d}" for y, m in zip(years, months)],
+        'amount': monthly_totals.to_numpy()
+    })
     
     fig = px.line(monthly_spending, x='month_year', y='amount', title="Monthly Spending Trend")
     st.plotly_chart(fig, use_container_width=True)
@@ -354,7 +637,7 @@ def show_analytics(tracker):
     col1, col2 = st.columns(2)
     
     with col1:
-        category_totals = filtered_data.groupby('category')['amount'].sum().sort_values(ascending=False)
+        category_totals = _category_totals(filtered_data).sort_values(ascending=False)
         fig = px.bar(x=category_totals.index, y=category_totals.values, title="Spending by Category")
         st.plotly_chart(fig, use_container_width=True)
     
@@ -377,15 +660,19 @@ def show_analytics(tracker):
     else:
         st.warning(message)
 
+@st.fragment
 def show_budget_management(tracker):
     """Show budget management interface"""
     st.header("💰 Budget Management")
     
+    # set_budget replaces the shared dict rather than mutating it, so this stays consistent
+    budgets = tracker.budgets
+    
     # Current budgets
     st.subheader("Current Budgets")
     
-    if tracker.budgets:
-        budget_df = pd.DataFrame(list(tracker.budgets.items()), columns=['Category', 'Budget Amount'])
+    if budgets:
+        budget_df = pd.DataFrame(list(budgets.items()), columns=['Category', 'Budget Amount'])
         st.dataframe(budget_df, use_container_width=True)
     else:
         st.info("No budgets set yet.")
@@ -408,24 +695,22 @@ def show_budget_management(tracker):
         submitted = st.form_submit_button("Set Budget", type="primary")
         
         if submitted:
-            tracker.budgets[category] = budget_amount
-            tracker.save_data()
+            tracker.set_budget(category, budget_amount)
             st.success(f"✅ Budget set for {category}: ₹{budget_amount:,.2f}")
-            st.rerun()
+            # Redraw just this page so the budget tables pick up the change
+            st.rerun(scope="fragment")
     
     # Budget vs Actual
-    if tracker.budgets:
+    if budgets:
         st.subheader("Budget vs Actual (Current Month)")
         current_year = datetime.now().year
         current_month = datetime.now().month
         
+        # One pass over the month's expenses, then a lookup per budget
+        totals = tracker.cat_totals_for_month(current_year, current_month)
         budget_comparison = []
-        for category, budget in tracker.budgets.items():
-            monthly_data = tracker.get_monthly_summary(current_year, current_month)
-            if not monthly_data.empty:
-                spent = monthly_data[monthly_data['category'] == category]['amount'].sum()
-            else:
-                spent = 0
+        for category, budget in budgets.items():
+            spent = totals.get(category, 0.0)
             
             budget_comparison.append({
                 'Category': category,
@@ -455,10 +740,14 @@ def show_ai_insights(tracker):
     # Basic insights without OpenAI API
     st.subheader("Smart Insights")
     
+    # All the whole-history statistics in one pass over the amounts
+    expenses_df = tracker.expenses_df
+    small_count, small_total, monthly_totals = _insights_pass(
+        expenses_df['amount'].to_numpy(dtype=np.float64),
+        expenses_df['_ym'].to_numpy()
+    )
+    
     # Spending patterns
-    tracker.expenses_df['year'] = tracker.expenses_df['date'].dt.year
-    tracker.expenses_df['month'] = tracker.expenses_df['date'].dt.month
-    monthly_totals = tracker.expenses_df.groupby(['year', 'month'])['amount'].sum()
     
     if len(monthly_totals) >= 2:
         recent_avg = monthly_totals.tail(3).mean()
@@ -474,7 +763,7 @@ def show_ai_insights(tracker):
             st.info(f"📊 Your spending has been relatively stable with a {change_percent:.1f}% change.")
     
     # Category insights
-    category_totals = tracker.expenses_df.groupby('category')['amount'].sum().sort_values(ascending=False)
+    category_totals = tracker.cat_totals().sort_values(ascending=False)
     
     st.subheader("Category Analysis")
     col1, col2 = st.columns(2)
@@ -501,10 +790,8 @@ def show_ai_insights(tracker):
     st.write(f"• **Focus on {top_category}**: You've spent ₹{top_amount:,.2f} in this category. Consider setting a budget or finding ways to reduce costs.")
     
     # Check for frequent small expenses
-    small_expenses = tracker.expenses_df[tracker.expenses_df['amount'] < 100]
-    if len(small_expenses) > 10:
-        small_total = small_expenses['amount'].sum()
-        st.write(f"• **Small expenses add up**: You have {len(small_expenses)} small expenses totaling ₹{small_total:,.2f}. Consider tracking these more carefully.")
+    if small_count > 10:
+        st.write(f"• **Small expenses add up**: You have {small_count} small expenses totaling ₹{small_total:,.2f}. Consider tracking these more carefully.")
     
     # Monthly consistency
     if len(monthly_totals) >= 3:
@@ -533,10 +820,7 @@ def show_reports(tracker):
         end_date = st.date_input("Report End Date", value=tracker.expenses_df['date'].max().date())
     
     # Filter data
-    filtered_data = tracker.expenses_df[
-        (tracker.expenses_df['date'].dt.date >= start_date) & 
-        (tracker.expenses_df['date'].dt.date <= end_date)
-    ]
+    filtered_data = tracker.range_slice(start_date, end_date)
     
     if filtered_data.empty:
         st.warning("No data available for the selected period.")
@@ -565,10 +849,11 @@ def show_reports(tracker):
     
     # Category breakdown
     st.subheader("Category Breakdown")
-    category_summary = filtered_data.groupby('category').agg({
+    category_summary = filtered_data.groupby('category', observed=True).agg({
         'amount': ['sum', 'count', 'mean']
-    }).round(2)
+    })
     category_summary.columns = ['Total Amount', 'Count', 'Average']
+    category_summary = category_summary.round(2)
     st.dataframe(category_summary, use_container_width=True)
     
     # Export options
@@ -578,19 +863,34 @@ def show_reports(tracker):
     
     with col1:
         if st.button("📊 Export to Excel", type="primary"):
-            # Create Excel file
+            # Imported here so other pages don't pay for it on every rerun
+            import xlsxwriter
+            
+            # Create Excel file, flushing each row as it is written
             output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                filtered_data.to_excel(writer, sheet_name='Expenses', index=False)
-                category_summary.to_excel(writer, sheet_name='Category Summary')
+            workbook = xlsxwriter.Workbook(output, {
+                'constant_memory': True,
+                'default_date_format': 'yyyy-mm-dd'
+            })
+            _write_sheet(workbook, 'Expenses', filtered_data[EXPENSE_COLUMNS])
+            _write_sheet(workbook, 'Category Summary', category_summary.reset_index())
+            workbook.close()
             
-            output.seek(0)
-            b64 = base64.b64encode(output.read()).decode()
-            href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="expense_report.xlsx">Download Excel Report</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            st.download_button(
+                "Download Excel Report",
+                data=output.getvalue(),
+                file_name="expense_report.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
     
     with col2:
         if st.button("📄 Export to PDF", type="primary"):
+            # Imported here so other pages don't pay for it on every rerun
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.lib import colors
+            
             # Create PDF report
             buffer = io.BytesIO()
             doc = SimpleDocTemplate(buffer, pagesize=letter)
@@ -615,14 +915,14 @@ def show_reports(tracker):
             
             # Category table
             story.append(Paragraph("Category Breakdown", styles['Heading2']))
-            table_data = [['Category', 'Total Amount', 'Count', 'Average']]
-            for category, row in category_summary.iterrows():
-                table_data.append([
-                    category,
-                    f"₹{row['Total Amount']:,.2f}",
-                    str(row['Count']),
-                    f"₹{row['Average']:,.2f}"
-                ])
+            # Format whole columns at once, then zip them into rows
+            totals = map("₹{:,.2f}".format, category_summary['Total Amount'].tolist())
+            counts = map(str, category_summary['Count'].tolist())
+            averages = map("₹{:,.2f}".format, category_summary['Average'].tolist())
+            table_data = [
+                ['Category', 'Total Amount', 'Count', 'Average'],
+                *map(list, zip(category_summary.index.astype(str), totals, counts, averages))
+            ]
             
             table = Table(table_data)
             table.setStyle(TableStyle([
@@ -638,11 +938,13 @@ def show_reports(tracker):
             story.append(table)
             
             doc.build(story)
-            buffer.seek(0)
             
-            b64 = base64.b64encode(buffer.read()).decode()
-            href = f'<a href="data:application/pdf;base64,{b64}" download="expense_report.pdf">Download PDF Report</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            st.download_button(
+                "Download PDF Report",
+                data=buffer.getvalue(),
+                file_name="expense_report.pdf",
+                mime="application/pdf"
+            )
 
 if __name__ == "__main__":
     main()